@@ -1,16 +1,20 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import contextlib
 import datetime
+import io
+import numbers
 import numpy as np
 import os.path as osp
 import tempfile
 import warnings
-from collections import OrderedDict
+from collections import abc
 from json import dump
-from typing import Dict, List, Optional, Sequence, Union
+from multiprocessing.pool import Pool
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
 
 from mmeval.core.base_metric import BaseMetric
-from mmeval.fileio import get_local_path, load
-from mmeval.utils import is_list_of
+from mmeval.fileio import get_local_path
+from mmeval.utils import is_list_of, is_seq_of, try_import
 
 try:
     from mmeval.metrics.utils.coco_wrapper import COCO, COCOeval
@@ -18,6 +22,196 @@ try:
 except ImportError:
     HAS_COCOAPI = False
 
+orjson = try_import('orjson')
+
+# mapping of cocoEval.stats
+COCO_METRIC_NAMES = {
+    'mAP': 0,
+    'mAP_50': 1,
+    'mAP_75': 2,
+    'mAP_s': 3,
+    'mAP_m': 4,
+    'mAP_l': 5,
+    'AR@100': 6,
+    'AR@300': 7,
+    'AR@1000': 8,
+    'AR_s@1000': 9,
+    'AR_m@1000': 10,
+    'AR_l@1000': 11
+}
+
+# mapping of metric to the iou type of cocoEval
+COCO_IOU_TYPES = {'bbox': 'bbox', 'segm': 'segm', 'proposal': 'bbox'}
+
+
+def _evaluate_metric(coco_api: 'COCO', metric: str, predictions: List[dict],
+                     cat_ids: list, img_ids: list, iou_thrs: np.ndarray,
+                     proposal_nums: list, classwise: bool,
+                     metric_items: Optional[Sequence[str]]) -> Optional[dict]:
+    """Evaluate a single metric with the COCO api.
+
+    Args:
+        coco_api (COCO): The COCO api of the ground truth.
+        metric (str): The metric to be evaluated, 'bbox', 'segm' or
+            'proposal'.
+        predictions (List[dict]): The COCO style predictions.
+        cat_ids (list): The category ids to be evaluated.
+        img_ids (list): The image ids to be evaluated.
+        iou_thrs (np.ndarray): IoU thresholds to compute AP and AR.
+        proposal_nums (list): Numbers of proposals to be evaluated.
+        classwise (bool): Whether to compute the results of each class.
+        metric_items (Sequence[str], optional): Metric result names to be
+            recorded in the evaluation result.
+
+    Returns:
+        dict, optional: The evaluation results of this metric, or None if
+        the predictions of the whole dataset are empty.
+    """
+    print(f'Evaluating {metric}...')
+
+    # evaluate proposal, bbox and segm
+    iou_type = COCO_IOU_TYPES[metric]
+    try:
+        if iou_type == 'segm':
+            # Refer to https://github.com/cocodataset/cocoapi/blob/master/PythonAPI/pycocotools/coco.py#L331  # noqa
+            # When evaluating mask AP, if the results contain bbox,
+            # cocoapi will use the box area instead of the mask area
+            # for calculating the instance area. Though the overall AP
+            # is not affected, this leads to different
+            # small/medium/large mask AP results.
+            for x in predictions:
+                x.pop('bbox')
+        coco_dt = coco_api.loadRes(predictions)
+
+    except IndexError:
+        return None
+
+    coco_eval = COCOeval(coco_api, coco_dt, iou_type)
+
+    coco_eval.params.catIds = cat_ids
+    coco_eval.params.imgIds = img_ids
+    coco_eval.params.maxDets = proposal_nums
+    coco_eval.params.iouThrs = iou_thrs
+
+    eval_results: dict = dict()
+    if metric == 'proposal':
+        coco_eval.params.useCats = 0
+        coco_eval.evaluate()
+        coco_eval.accumulate()
+        coco_eval.summarize()
+        if metric_items is None:
+            metric_items = [
+                'AR@100', 'AR@300', 'AR@1000', 'AR_s@1000', 'AR_m@1000',
+                'AR_l@1000'
+            ]
+
+        results_list = []
+        for item in metric_items:
+            val = round(float(coco_eval.stats[COCO_METRIC_NAMES[item]]), 3)
+            results_list.append(f'{val * 100:.1f}')
+            eval_results[item] = val
+        eval_results[f'{metric}_result'] = results_list
+    else:
+        coco_eval.evaluate()
+        coco_eval.accumulate()
+        coco_eval.summarize()
+        if classwise:  # Compute per-category AP
+            # Compute per-category AP
+            # from https://github.com/facebookresearch/detectron2/
+            precisions = coco_eval.eval['precision']
+            # precision: (iou, recall, cls, area range, max dets)
+            assert len(cat_ids) == precisions.shape[2]
+
+            # area range index 0: all area ranges
+            # max dets index -1: typically 100 per image
+            precision = precisions[:, :, :, 0, -1]
+            # average the valid precisions of all categories at once,
+            # categories without any valid precision get nan.
+            valid = precision > -1
+            num_valid = valid.sum(axis=(0, 1))
+            precision_sum = precision.sum(axis=(0, 1), where=valid)
+            aps = np.full(len(cat_ids), float('nan'))
+            np.divide(precision_sum, num_valid, out=aps, where=num_valid > 0)
+
+            results_per_category = []
+            cat_names = [cat['name'] for cat in coco_api.loadCats(cat_ids)]
+            for cat_name, ap in zip(cat_names, aps):
+                ap = round(ap, 3)
+                results_per_category.append((f'{cat_name}', f'{ap}'))
+                eval_results[f'{metric}_{cat_name}_precision'] = ap
+
+            eval_results[f'{metric}_classwise_result'] = \
+                results_per_category
+        if metric_items is None:
+            metric_items = [
+                'mAP', 'mAP_50', 'mAP_75', 'mAP_s', 'mAP_m', 'mAP_l'
+            ]
+
+        results_list = []
+        for metric_item in metric_items:
+            key = f'{metric}_{metric_item}'
+            val = coco_eval.stats[COCO_METRIC_NAMES[metric_item]]
+            val = round(float(val), 3)
+            results_list.append(f'{val * 100:.1f}')
+            eval_results[key] = val
+        eval_results[f'{metric}_result'] = results_list
+    return eval_results
+
+
+def _dump_json(obj: Union[dict, list], file_path: str) -> None:
+    """Dump the object to a json file, using orjson if it is available.
+
+    Args:
+        obj (dict | list): The object to be dumped.
+        file_path (str): The path of the json file.
+    """
+    if orjson is not None:
+        with open(file_path, 'wb') as f:
+            f.write(orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY))
+    else:
+        with open(file_path, 'w') as f:
+            dump(obj, f)
+
+
+def _describe_non_dict(seq: Any) -> str:
+    """Describe the offending type of an input that is expected to be a
+    sequence of dict, used for the error messages of
+    :meth:`COCODetection.add`.
+
+    Args:
+        seq (Any): The input that fails the check.
+
+    Returns:
+        str: The type of ``seq`` if it is not a sequence, otherwise the
+        type of its first item that is not a dict.
+    """
+    if not isinstance(seq, abc.Sequence):
+        return f'{type(seq)}'
+    item = next(item for item in seq if not isinstance(item, dict))
+    return f'a sequence of {type(item)}'
+
+
+# The COCO api shared by the evaluation worker processes.
+_worker_coco_api: Optional['COCO'] = None
+
+
+def _init_eval_worker(coco_api: 'COCO') -> None:
+    """Set the COCO api used by :func:`_evaluate_metric_in_worker`."""
+    global _worker_coco_api
+    _worker_coco_api = coco_api
+
+
+def _evaluate_metric_in_worker(*args) -> Tuple[Optional[dict], str]:
+    """Run :func:`_evaluate_metric` in a worker process.
+
+    The printed messages are captured and returned, so that the main process
+    can print them in order instead of interleaving the outputs of workers.
+    """
+    assert _worker_coco_api is not None
+    with contextlib.redirect_stdout(io.StringIO()) as f:
+        eval_results = _evaluate_metric(_worker_coco_api, *args)
+    return eval_results, f.getvalue()
+
 
 class COCODetection(BaseMetric):
     """COCO object detection task evaluation metric.
@@ -47,13 +241,30 @@ class COCODetection(BaseMetric):
             Defaults to False.
         outfile_prefix (str, optional): The prefix of json files. It includes
             the file path and the prefix of filename, e.g., "a/b/prefix".
-            If not specified, a temp file will be created. Defaults to None.
+            If not specified, the results will not be dumped, and when the
+            ground truth has to be converted (``ann_file`` is None), it will
+            be saved to a temp directory. Defaults to None.
         gt_mask_area (bool): Whether to calculate GT mask area when not
             loading ann_file. If True, the GT instance area will be the mask
             area, else the bounding box area. It will not be used when loading
             ann_file. Defaults to True.
         backend_args (dict, optional): Arguments to instantiate the
             preifx of uri corresponding backend. Defaults to None.
+        dets_per_class (int, optional): The maximum number of detections of
+            each category kept over the whole dataset, ranked by scores. It
+            bounds the evaluation cost of dense predictions, e.g. LVIS keeps
+            10000 detections per category, refer to `Evaluating
+            Large-Vocabulary Object Detectors: The Devil is in the Details
+            <https://arxiv.org/abs/2102.01066>`_ for more details. It only
+            applies to the 'bbox' and 'segm' metrics (and the dumped json
+            files), the class-agnostic 'proposal' metric always uses all
+            detections. If not specified, all detections will be kept.
+            Defaults to None.
+        nproc (int): Processes used for evaluating the metrics in parallel.
+            If nproc is less than or equal to 1, multiprocessing will not be
+            used. Note that the predictions of each metric, including the RLE
+            masks, are pickled into its worker process, and 'bbox' and
+            'proposal' get separate copies. Defaults to 1.
         **kwargs: Keyword parameters passed to :class:`BaseMetric`.
 
     Examples:
@@ -152,6 +363,8 @@ class COCODetection(BaseMetric):
                  outfile_prefix: Optional[str] = None,
                  gt_mask_area: bool = True,
                  backend_args: Optional[dict] = None,
+                 dets_per_class: Optional[int] = None,
+                 nproc: int = 1,
                  **kwargs) -> None:
         if not HAS_COCOAPI:
             raise RuntimeError('Failed to import `COCO` and `COCOeval` from '
@@ -161,9 +374,8 @@ class COCODetection(BaseMetric):
         super().__init__(**kwargs)
         # coco evaluation metrics
         self.metrics = metric if isinstance(metric, list) else [metric]
-        allowed_metrics = ['bbox', 'segm', 'proposal']
         for metric in self.metrics:
-            if metric not in allowed_metrics:
+            if metric not in COCO_IOU_TYPES:
                 raise KeyError(
                     "metric should be one of 'bbox', 'segm', 'proposal', "
                     f"'proposal_fast', but got {metric}.")
@@ -187,6 +399,11 @@ class COCODetection(BaseMetric):
                 '`iou_thrs` should be None, float, or a list of float')
 
         self.iou_thrs = iou_thrs
+        if metric_items is not None:
+            for metric_item in metric_items:
+                if metric_item not in COCO_METRIC_NAMES:
+                    raise KeyError(
+                        f'metric item "{metric_item}" is not supported')
         self.metric_items = metric_items
         self.format_only = format_only
         if self.format_only:
@@ -208,6 +425,13 @@ class COCODetection(BaseMetric):
             self._coco_api = None
 
         self.gt_mask_area = gt_mask_area
+        if dets_per_class is not None and (
+                not isinstance(dets_per_class, numbers.Integral)
+                or isinstance(dets_per_class, bool) or dets_per_class <= 0):
+            raise ValueError('`dets_per_class` should be None or a positive '
+                             f'int, but got {dets_per_class}.')
+        self.dets_per_class = dets_per_class
+        self.nproc = nproc
         # handle dataset lazy init
         self.cat_ids: list = []
         self.img_ids: list = []
@@ -232,73 +456,174 @@ class COCODetection(BaseMetric):
             _bbox[3] - _bbox[1],
         ]
 
-    def results2json(self, results: Sequence[dict],
-                     outfile_prefix: str) -> dict:
-        """Dump the detection results to a COCO style json file.
+    def results2coco(self, results: Sequence[dict]) -> dict:
+        """Convert the detection results to COCO style.
 
         There are 3 types of results: proposals, bbox predictions, mask
         predictions, and they have different data types. This method will
-        automatically recognize the type, and dump them to json files.
+        automatically recognize the type, and convert them to COCO style.
 
         Args:
             results (Sequence[dict]): Testing results of the
                 dataset.
-            outfile_prefix (str): The filename prefix of the json files. If the
-                prefix is "somepath/xxx", the json files will be named
-                "somepath/xxx.bbox.json", "somepath/xxx.segm.json",
-                "somepath/xxx.proposal.json".
 
         Returns:
             dict: Possible keys are "bbox", "segm", "proposal", and
-            values are corresponding filenames.
+            values are corresponding lists of COCO style results.
         """
         bbox_json_results = []
         segm_json_results: Optional[
             list] = [] if 'masks' in results[0] else None
+        cat_ids = np.asarray(self.cat_ids)
         for idx, result in enumerate(results):
             image_id = result.get('img_id', idx)
-            labels = result['labels']
-            bboxes = result['bboxes']
-            scores = result['scores']
+            labels = np.asarray(result['labels'], dtype=np.int64)
+            bboxes = np.asarray(
+                result['bboxes'], dtype=np.float64).reshape(-1, 4)
+            scores = np.asarray(result['scores'], dtype=np.float64)
+            # convert the fields of all bboxes at once rather than one by one
+            xywh_bboxes = np.concatenate(
+                [bboxes[:, :2], bboxes[:, 2:] - bboxes[:, :2]],
+                axis=1).tolist()
+            category_ids = cat_ids[labels].tolist()
             # bbox results
-            for i, label in enumerate(labels):
-                data = dict()
-                data['image_id'] = image_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(scores[i])
-                data['category_id'] = self.cat_ids[label]
-                bbox_json_results.append(data)
+            for bbox, score, category_id in zip(xywh_bboxes, scores.tolist(),
+                                                category_ids):
+                bbox_json_results.append(
+                    dict(
+                        image_id=image_id,
+                        bbox=bbox,
+                        score=score,
+                        category_id=category_id))
 
             if segm_json_results is None:
                 continue
 
             # segm results
             masks = result['masks']
-            mask_scores = result.get('mask_scores', scores)
-            for i, label in enumerate(labels):
-                data = dict()
-                data['image_id'] = image_id
-                data['bbox'] = self.xyxy2xywh(bboxes[i])
-                data['score'] = float(mask_scores[i])
-                data['category_id'] = self.cat_ids[label]
-                if isinstance(masks[i]['counts'], bytes):
-                    masks[i]['counts'] = masks[i]['counts'].decode()
-                data['segmentation'] = masks[i]
-                segm_json_results.append(data)
+            mask_scores = np.asarray(
+                result.get('mask_scores', scores), dtype=np.float64)
+            for bbox, score, category_id, mask in zip(xywh_bboxes,
+                                                      mask_scores.tolist(),
+                                                      category_ids, masks):
+                if isinstance(mask['counts'], bytes):
+                    mask['counts'] = mask['counts'].decode()
+                segm_json_results.append(
+                    dict(
+                        image_id=image_id,
+                        bbox=bbox,
+                        score=score,
+                        category_id=category_id,
+                        segmentation=mask))
+
+        coco_results = dict()
+        coco_results['bbox'] = bbox_json_results
+        coco_results['proposal'] = bbox_json_results
+        if segm_json_results is not None:
+            coco_results['segm'] = segm_json_results
+
+        return coco_results
+
+    def dump_results(self, coco_results: dict, outfile_prefix: str) -> dict:
+        """Dump the COCO style results to json files.
+
+        Args:
+            coco_results (dict): The COCO style results returned by
+                :meth:`results2coco`.
+            outfile_prefix (str): The filename prefix of the json files. If the
+                prefix is "somepath/xxx", the json files will be named
+                "somepath/xxx.bbox.json", "somepath/xxx.segm.json",
+                "somepath/xxx.proposal.json".
 
+        Returns:
+            dict: Possible keys are "bbox", "segm", "proposal", and
+            values are corresponding filenames.
+        """
         result_files = dict()
         result_files['bbox'] = f'{outfile_prefix}.bbox.json'
         result_files['proposal'] = f'{outfile_prefix}.bbox.json'
-        with open(result_files['bbox'], 'w') as f:
-            dump(bbox_json_results, f)
+        _dump_json(coco_results['bbox'], result_files['bbox'])
 
-        if segm_json_results is not None:
+        if 'segm' in coco_results:
             result_files['segm'] = f'{outfile_prefix}.segm.json'
-            with open(result_files['segm'], 'w') as f:
-                dump(segm_json_results, f)
+            _dump_json(coco_results['segm'], result_files['segm'])
 
         return result_files
 
+    def results2json(self, results: Sequence[dict],
+                     outfile_prefix: str) -> dict:
+        """Dump the detection results to a COCO style json file.
+
+        Args:
+            results (Sequence[dict]): Testing results of the
+                dataset.
+            outfile_prefix (str): The filename prefix of the json files. If the
+                prefix is "somepath/xxx", the json files will be named
+                "somepath/xxx.bbox.json", "somepath/xxx.segm.json",
+                "somepath/xxx.proposal.json".
+
+        Returns:
+            dict: Possible keys are "bbox", "segm", "proposal", and
+            values are corresponding filenames.
+        """
+        return self.dump_results(self.results2coco(results), outfile_prefix)
+
+    def _limit_dets_per_class(self, results: Sequence[dict]) -> List[dict]:
+        """Keep the top ``self.dets_per_class`` scoring detections of each
+        category over the whole dataset.
+
+        Args:
+            results (Sequence[dict]): Testing results of the dataset.
+
+        Returns:
+            List[dict]: The results with the detections out of the top
+            ``self.dets_per_class`` of their category removed.
+        """
+        dets_per_class = self.dets_per_class
+        assert dets_per_class is not None
+        labels = np.concatenate([
+            np.asarray(result['labels'], dtype=np.int64) for result in results
+        ])
+        scores = np.concatenate([
+            np.asarray(result['scores'], dtype=np.float64)
+            for result in results
+        ])
+
+        # group the detections of the whole dataset by category
+        order = np.argsort(labels, kind='stable')
+        split_points = np.flatnonzero(np.diff(labels[order])) + 1
+        keep = np.zeros(len(labels), dtype=bool)
+        for inds in np.split(order, split_points):
+            if len(inds) > dets_per_class:
+                # the kept detections need not be sorted, so a partial sort
+                # is enough to select the top k.
+                topk = np.argpartition(-scores[inds], dets_per_class - 1)
+                inds = inds[topk[:dets_per_class]]
+            keep[inds] = True
+
+        num_dets = [len(result['labels']) for result in results]
+        split_points = np.cumsum(num_dets)[:-1]
+        limited_results = []
+        keeps = np.split(keep, split_points)
+        labels_list = np.split(labels, split_points)
+        scores_list = np.split(scores, split_points)
+        for result, result_keep, result_labels, result_scores in zip(
+                results, keeps, labels_list, scores_list):
+            result = result.copy()
+            result['labels'] = result_labels[result_keep]
+            result['scores'] = result_scores[result_keep]
+            result['bboxes'] = np.asarray(result['bboxes']).reshape(
+                -1, 4)[result_keep]
+            if 'mask_scores' in result:
+                result['mask_scores'] = np.asarray(
+                    result['mask_scores'])[result_keep]
+            if 'masks' in result:
+                result['masks'] = [
+                    mask for mask, k in zip(result['masks'], result_keep) if k
+                ]
+            limited_results.append(result)
+        return limited_results
+
     def gt_to_coco_json(self, gt_dicts: Sequence[dict],
                         outfile_prefix: str) -> str:
         """Convert ground truth to coco format json file.
@@ -389,8 +714,7 @@ class COCODetection(BaseMetric):
         if len(annotations) > 0:
             coco_json['annotations'] = annotations
         converted_json_path = f'{outfile_prefix}.gt.json'
-        with open(converted_json_path, 'w') as f:
-            dump(coco_json, f)
+        _dump_json(coco_json, converted_json_path)
         return converted_json_path
 
     def add(self, predictions: Sequence[Dict], groundtruths: Sequence[Dict]) -> None:  # type: ignore # yapf: disable # noqa: E501
@@ -428,12 +752,11 @@ class COCODetection(BaseMetric):
                 - ignore_flags (numpy.ndarray, optional): Shape (K, ),
                   the ignore flags.
         """
-        for prediction, groundtruth in zip(predictions, groundtruths):
-            assert isinstance(prediction, dict), 'The prediciton should be ' \
-                f'a sequence of dict, but got a sequence of {type(prediction)}.'  # noqa: E501
-            assert isinstance(groundtruth, dict), 'The label should be ' \
-                f'a sequence of dict, but got a sequence of {type(groundtruth)}.'   # noqa: E501
-            self._results.append((prediction, groundtruth))
+        assert is_seq_of(predictions, dict), 'The prediciton should be ' \
+            f'a sequence of dict, but got {_describe_non_dict(predictions)}.'
+        assert is_seq_of(groundtruths, dict), 'The label should be ' \
+            f'a sequence of dict, but got {_describe_non_dict(groundtruths)}.'
+        self._results.extend(zip(predictions, groundtruths))
 
     def add_predictions(self, predictions: Sequence[Dict]) -> None:
         """Add predictions only.
@@ -482,22 +805,22 @@ class COCODetection(BaseMetric):
             dict: The computed metric. The keys are the names of
             the metrics, and the values are corresponding results.
         """
-        tmp_dir = None
-        if self.outfile_prefix is None:
-            tmp_dir = tempfile.TemporaryDirectory()
-            outfile_prefix = osp.join(tmp_dir.name, 'results')
-        else:
-            outfile_prefix = self.outfile_prefix
-
         # split gt and prediction list
         preds, gts = zip(*results)
 
         if self._coco_api is None:
             # use converted gt json file to initialize coco api
             print('Converting ground truth to coco format...')
-            coco_json_path = self.gt_to_coco_json(
-                gt_dicts=gts, outfile_prefix=outfile_prefix)
-            self._coco_api = COCO(coco_json_path)
+            if self.outfile_prefix is None:
+                with tempfile.TemporaryDirectory() as tmp_dir:
+                    coco_json_path = self.gt_to_coco_json(
+                        gt_dicts=gts,
+                        outfile_prefix=osp.join(tmp_dir, 'results'))
+                    self._coco_api = COCO(coco_json_path)
+            else:
+                coco_json_path = self.gt_to_coco_json(
+                    gt_dicts=gts, outfile_prefix=self.outfile_prefix)
+                self._coco_api = COCO(coco_json_path)
 
         # handle lazy init
         if len(self.cat_ids) == 0:
@@ -506,129 +829,57 @@ class COCODetection(BaseMetric):
         if len(self.img_ids) == 0:
             self.img_ids = self._coco_api.get_img_ids()
 
-        # convert predictions to coco format and dump to json file
-        result_files = self.results2json(preds, outfile_prefix)
-
-        eval_results: OrderedDict = OrderedDict()
-        if self.format_only:
-            print('results are saved in '
-                  f'{osp.dirname(outfile_prefix)}')
-            return eval_results
-
+        # convert predictions to coco format, only dump them to json files
+        # when `outfile_prefix` is specified.
+        if self.dets_per_class is None:
+            coco_results = self.results2coco(preds)
+        else:
+            coco_results = self.results2coco(
+                self._limit_dets_per_class(preds))
+            if 'proposal' in self.metrics:
+                # proposals are evaluated class-agnostic, so they are not
+                # limited per category.
+                coco_results['proposal'] = self.results2coco(
+                    preds)['proposal']
+        eval_results: dict = dict()
+        if self.outfile_prefix is not None:
+            self.dump_results(coco_results, self.outfile_prefix)
+            # `outfile_prefix` is always specified when `format_only` is True
+            if self.format_only:
+                print('results are saved in '
+                      f'{osp.dirname(self.outfile_prefix)}')
+                return eval_results
+
+        eval_args = []
         for metric in self.metrics:
-            print(f'Evaluating {metric}...')
-
-            # evaluate proposal, bbox and segm
-            iou_type = 'bbox' if metric == 'proposal' else metric
-            if metric not in result_files:
+            if metric not in coco_results:
                 raise KeyError(f'{metric} is not in results')
-            try:
-                predictions = load(result_files[metric])
-                if iou_type == 'segm':
-                    # Refer to https://github.com/cocodataset/cocoapi/blob/master/PythonAPI/pycocotools/coco.py#L331  # noqa
-                    # When evaluating mask AP, if the results contain bbox,
-                    # cocoapi will use the box area instead of the mask area
-                    # for calculating the instance area. Though the overall AP
-                    # is not affected, this leads to different
-                    # small/medium/large mask AP results.
-                    for x in predictions:
-                        x.pop('bbox')
-                coco_dt = self._coco_api.loadRes(predictions)
-
-            except IndexError:
+            eval_args.append(
+                (metric, coco_results[metric], self.cat_ids, self.img_ids,
+                 self.iou_thrs, self.proposal_nums, self.classwise,
+                 self.metric_items))
+
+        nproc = min(self.nproc, len(eval_args))
+        if nproc > 1:
+            # share the coco api through the initializer, so that the ground
+            # truth index is not pickled for every metric.
+            with Pool(
+                    nproc,
+                    initializer=_init_eval_worker,
+                    initargs=(self._coco_api, )) as pool:
+                outputs = pool.starmap(_evaluate_metric_in_worker, eval_args)
+            metric_results_list, printed = zip(*outputs)
+            print(''.join(printed), end='')
+        else:
+            metric_results_list = [
+                _evaluate_metric(self._coco_api, *args) for args in eval_args
+            ]
+
+        for metric_results in metric_results_list:
+            if metric_results is None:
                 print('The testing results of the whole dataset is empty.')
                 break
-
-            coco_eval = COCOeval(self._coco_api, coco_dt, iou_type)
-
-            coco_eval.params.catIds = self.cat_ids
-            coco_eval.params.imgIds = self.img_ids
-            coco_eval.params.maxDets = self.proposal_nums
-            coco_eval.params.iouThrs = self.iou_thrs
-
-            # mapping of cocoEval.stats
-            coco_metric_names = {
-                'mAP': 0,
-                'mAP_50': 1,
-                'mAP_75': 2,
-                'mAP_s': 3,
-                'mAP_m': 4,
-                'mAP_l': 5,
-                'AR@100': 6,
-                'AR@300': 7,
-                'AR@1000': 8,
-                'AR_s@1000': 9,
-                'AR_m@1000': 10,
-                'AR_l@1000': 11
-            }
-            metric_items = self.metric_items
-            if metric_items is not None:
-                for metric_item in metric_items:
-                    if metric_item not in coco_metric_names:
-                        raise KeyError(
-                            f'metric item "{metric_item}" is not supported')
-
-            if metric == 'proposal':
-                coco_eval.params.useCats = 0
-                coco_eval.evaluate()
-                coco_eval.accumulate()
-                coco_eval.summarize()
-                if metric_items is None:
-                    metric_items = [
-                        'AR@100', 'AR@300', 'AR@1000', 'AR_s@1000',
-                        'AR_m@1000', 'AR_l@1000'
-                    ]
-
-                results_list = []
-                for item in metric_items:
-                    val = float(
-                        f'{coco_eval.stats[coco_metric_names[item]]:.3f}')
-                    results_list.append(f'{val * 100:.1f}')
-                    eval_results[item] = val
-                eval_results[f'{metric}_result'] = results_list
-            else:
-                coco_eval.evaluate()
-                coco_eval.accumulate()
-                coco_eval.summarize()
-                if self.classwise:  # Compute per-category AP
-                    # Compute per-category AP
-                    # from https://github.com/facebookresearch/detectron2/
-                    precisions = coco_eval.eval['precision']
-                    # precision: (iou, recall, cls, area range, max dets)
-                    assert len(self.cat_ids) == precisions.shape[2]
-
-                    results_per_category = []
-                    for idx, cat_id in enumerate(self.cat_ids):
-                        # area range index 0: all area ranges
-                        # max dets index -1: typically 100 per image
-                        nm = self._coco_api.loadCats(cat_id)[0]
-                        precision = precisions[:, :, idx, 0, -1]
-                        precision = precision[precision > -1]
-                        if precision.size:
-                            ap = np.mean(precision)
-                        else:
-                            ap = float('nan')
-                        results_per_category.append(
-                            (f'{nm["name"]}', f'{round(ap, 3)}'))
-                        eval_results[f'{metric}_{nm["name"]}_precision'] = \
-                            round(ap, 3)
-
-                    eval_results[f'{metric}_classwise_result'] = \
-                        results_per_category
-                if metric_items is None:
-                    metric_items = [
-                        'mAP', 'mAP_50', 'mAP_75', 'mAP_s', 'mAP_m', 'mAP_l'
-                    ]
-
-                results_list = []
-                for metric_item in metric_items:
-                    key = f'{metric}_{metric_item}'
-                    val = coco_eval.stats[coco_metric_names[metric_item]]
-                    results_list.append(f'{round(val, 3) * 100:.1f}')
-                    eval_results[key] = float(f'{round(val, 3)}')
-                eval_results[f'{metric}_result'] = results_list
-        if tmp_dir is not None:
-            tmp_dir.cleanup()
+            eval_results.update(metric_results)
         return eval_results
 
 
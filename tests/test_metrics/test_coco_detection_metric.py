@@ -1,9 +1,10 @@
 # Copyright (c) OpenMMLab. All rights reserved.
+import multiprocessing
 import numpy as np
 import os.path as osp
 import pytest
 import tempfile
-from json import dump
+from json import dump, load
 
 from mmeval.core.base_metric import BaseMetric
 from mmeval.metrics import COCODetection
@@ -307,6 +308,21 @@ def test_metric_invalid_usage():
     with pytest.raises(TypeError):
         COCODetection(iou_thrs=1)
 
+    with pytest.raises(KeyError):
+        COCODetection(metric_items=['xxx'])
+
+    with pytest.raises(ValueError):
+        COCODetection(dets_per_class=0)
+
+    with pytest.raises(ValueError):
+        COCODetection(dets_per_class=-1)
+
+    with pytest.raises(ValueError):
+        COCODetection(dets_per_class=True)
+
+    with pytest.raises(ValueError):
+        COCODetection(dets_per_class=1.0)
+
     with pytest.raises(AssertionError):
         COCODetection(format_only=True)
 
@@ -328,6 +344,13 @@ def test_metric_invalid_usage():
         groundtruth = _gen_groundtruth(num_classes=num_classes)
         coco_det_metric(prediction, groundtruth)
 
+    with pytest.raises(
+            AssertionError, match="a sequence of <class 'numpy.ndarray'>"):
+        prediction = _gen_prediction(num_classes=num_classes)
+        groundtruth = _gen_groundtruth(num_classes=num_classes)
+        coco_det_metric([prediction, prediction['bboxes']],
+                        [groundtruth, groundtruth])
+
 
 @pytest.mark.skipif(
     coco_wrapper is None, reason='coco_wrapper is not available!')
@@ -387,6 +410,27 @@ def test_compute_metric():
     assert osp.isfile(osp.join(tmp_dir.name, 'test.bbox.json'))
     assert osp.isfile(osp.join(tmp_dir.name, 'test.segm.json'))
 
+    # test box and segm coco dataset evaluation with multiprocessing
+    coco_det_metric = COCODetection(
+        ann_file=fake_json_file,
+        classwise=False,
+        metric=['bbox', 'segm'],
+        outfile_prefix=f'{tmp_dir.name}/test',
+        nproc=2,
+        dataset_meta=fake_dataset_metas)
+    eval_results = coco_det_metric([dummy_pred], [dict()])
+    eval_results.pop('bbox_result')
+    eval_results.pop('segm_result')
+    assert eval_results == target
+
+    # the errors raised in worker processes should be propagated and the
+    # pool should be cleaned up
+    invalid_pred = _create_dummy_results()
+    invalid_pred['img_id'] = 1
+    with pytest.raises(AssertionError):
+        coco_det_metric([invalid_pred], [dict()])
+    assert len(multiprocessing.active_children()) == 0
+
     # test classwise result evaluation
     coco_det_metric = COCODetection(
         ann_file=fake_json_file,
@@ -427,6 +471,69 @@ def test_compute_metric():
     eval_results.pop('proposal_result')
     assert eval_results == target
 
+    # test limiting the detections of each class
+    coco_det_metric = COCODetection(
+        ann_file=fake_json_file,
+        classwise=True,
+        dets_per_class=np.int64(1),
+        dataset_meta=fake_dataset_metas)
+    limited_preds = coco_det_metric._limit_dets_per_class([dummy_pred])
+    np.testing.assert_array_equal(limited_preds[0]['scores'], [1.0, 0.96])
+    np.testing.assert_array_equal(limited_preds[0]['labels'], [0, 1])
+    assert len(limited_preds[0]['masks']) == 2
+    eval_results = coco_det_metric([dummy_pred], [dict()])
+    assert eval_results['bbox_bicycle_precision'] == 1.0
+    assert eval_results['bbox_car_precision'] < 1.0
+
+    # the class-agnostic proposal metric should not be limited
+    coco_det_metric = COCODetection(
+        ann_file=fake_json_file,
+        metric=['bbox', 'proposal'],
+        dets_per_class=1,
+        dataset_meta=fake_dataset_metas)
+    eval_results = coco_det_metric([dummy_pred], [dict()])
+    assert eval_results['bbox_mAP'] < 1.0
+    assert eval_results['AR@100'] == 1.0
+
+    # test images without detections and predictions given as lists
+    coco_det_metric = COCODetection(
+        ann_file=fake_json_file,
+        metric=['bbox', 'segm'],
+        dataset_meta=fake_dataset_metas)
+    list_pred = _create_dummy_results()
+    list_pred['scores'] = list_pred['scores'].tolist()
+    list_pred['mask_scores'] = list_pred['scores']
+    no_det_pred = dict(
+        img_id=1,
+        bboxes=np.array([]),
+        scores=[],
+        labels=np.array([]),
+        masks=[])
+    eval_results = coco_det_metric([list_pred, no_det_pred], [dict(), dict()])
+    assert eval_results['bbox_mAP'] == 1.0
+    assert eval_results['segm_mAP'] == 1.0
+
+    # test limiting the detections of each class with the same inputs
+    coco_det_metric = COCODetection(
+        ann_file=fake_json_file,
+        metric=['bbox', 'segm'],
+        classwise=True,
+        dets_per_class=2,
+        dataset_meta=fake_dataset_metas)
+    list_pred['labels'] = list_pred['labels'].tolist()
+    limited_preds = coco_det_metric._limit_dets_per_class(
+        [list_pred, no_det_pred])
+    np.testing.assert_array_equal(limited_preds[0]['scores'],
+                                  [1.0, 0.98, 0.96])
+    np.testing.assert_array_equal(limited_preds[0]['mask_scores'],
+                                  [1.0, 0.98, 0.96])
+    assert limited_preds[0]['bboxes'].shape == (3, 4)
+    assert len(limited_preds[0]['masks']) == 3
+    assert limited_preds[1]['bboxes'].shape == (0, 4)
+    eval_results = coco_det_metric([list_pred, no_det_pred], [dict(), dict()])
+    assert eval_results['bbox_bicycle_precision'] == 1.0
+    assert eval_results['bbox_car_precision'] < 1.0
+
     # test empty results
     coco_det_metric = COCODetection(
         ann_file=fake_json_file,
@@ -504,3 +611,73 @@ def test_compute_metric():
     eval_results.pop('segm_result')
     assert eval_results == target
     tmp_dir.cleanup()
+
+
+@pytest.mark.skipif(
+    coco_wrapper is None, reason='coco_wrapper is not available!')
+def test_no_temp_dir_with_ann_file(monkeypatch):
+    tmp_dir = tempfile.TemporaryDirectory()
+    fake_json_file = osp.join(tmp_dir.name, 'fake_data.json')
+    _create_dummy_coco_json(fake_json_file)
+    dummy_pred = _create_dummy_results()
+    fake_dataset_metas = dict(CLASSES=['car', 'bicycle'])
+
+    # the ground truth needs no conversion when `ann_file` is given, so no
+    # temp directory should be created.
+    def _no_temp_dir(*args, **kwargs):
+        raise AssertionError('temp directory should not be created')
+
+    monkeypatch.setattr(tempfile, 'TemporaryDirectory', _no_temp_dir)
+    coco_det_metric = COCODetection(
+        ann_file=fake_json_file,
+        metric=['bbox', 'segm'],
+        dataset_meta=fake_dataset_metas)
+    eval_results = coco_det_metric([dummy_pred], [dict()])
+    assert eval_results['bbox_mAP'] == 1.0
+    assert eval_results['segm_mAP'] == 1.0
+    monkeypatch.undo()
+    tmp_dir.cleanup()
+
+
+@pytest.mark.skipif(
+    coco_wrapper is None, reason='coco_wrapper is not available!')
+@pytest.mark.parametrize('use_orjson', [True, False])
+def test_dump_json(monkeypatch, use_orjson):
+    from mmeval.metrics import coco_detection
+    if not use_orjson:
+        # fall back to the stdlib json
+        monkeypatch.setattr(coco_detection, 'orjson', None)
+    elif coco_detection.orjson is None:
+        pytest.skip('orjson is not available!')
+
+    tmp_dir = tempfile.TemporaryDirectory()
+    outfile_prefix = osp.join(tmp_dir.name, 'test')
+    fake_dataset_metas = dict(CLASSES=['car', 'bicycle'])
+    coco_det_metric = COCODetection(dataset_meta=fake_dataset_metas)
+    coco_det_metric.cat_ids = [0, 1]
+
+    # the dumped results should load back to the same content
+    coco_results = coco_det_metric.results2coco([_create_dummy_results()])
+    result_files = coco_det_metric.dump_results(coco_results, outfile_prefix)
+    for key in ('bbox', 'segm'):
+        with open(result_files[key]) as f:
+            assert load(f) == coco_results[key]
+
+    # the dumped ground truth should load back to the same content
+    dummy_gt = _create_dummy_gts()
+    gt_json_path = coco_det_metric.gt_to_coco_json([dummy_gt], outfile_prefix)
+    with open(gt_json_path) as f:
+        gt_json = load(f)
+    assert gt_json['images'] == [
+        dict(id=0, width=640, height=640, file_name='')
+    ]
+    assert gt_json['categories'] == [
+        dict(id=0, name='car'), dict(id=1, name='bicycle')
+    ]
+    assert len(gt_json['annotations']) == len(dummy_gt['bboxes'])
+    for i, annotation in enumerate(gt_json['annotations']):
+        assert annotation['bbox'] == coco_det_metric.xyxy2xywh(
+            dummy_gt['bboxes'][i])
+        assert annotation['category_id'] == dummy_gt['labels'][i]
+        assert annotation['segmentation'] == dummy_gt['masks'][i]
+    tmp_dir.cleanup()